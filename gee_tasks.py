@@ -0,0 +1,32 @@
+"""Shared Earth Engine task polling for the upload and extraction
+scripts, so the logic lives once instead of drifting between
+upload_to_gee.py and working_weekly_data.py.
+"""
+
+import time
+
+import ee
+
+def poll_tasks(tasks):
+    """Wait for the submitted tasks using one ee.data.listOperations()
+    RPC per sweep, backing off exponentially between sweeps."""
+    task_ids = {task.id for task in tasks if task.id}
+    done_states = {'SUCCEEDED', 'FAILED', 'CANCELLED'}
+
+    sweep = 0
+    while task_ids:
+        states = {
+            op['name'].split('/')[-1]: op['metadata'].get('state')
+            for op in ee.data.listOperations()
+        }
+
+        # A task id the listing doesn't know about counts as pending:
+        # freshly started tasks can take a sweep to surface, and a
+        # listing hiccup must not read as "everything finished"
+        finished = sum(states.get(tid) in done_states for tid in task_ids)
+        print(f"  {finished}/{len(task_ids)} tasks finished")
+
+        if finished == len(task_ids):
+            return
+        time.sleep(min(60, 2 ** sweep))
+        sweep += 1
@@ -0,0 +1,27 @@
+"""Shared GeoJSON output for the tank scripts.
+
+One compact orjson writer instead of per-script copies, so the
+stdlib pretty-printer can't sneak back in for the multi-hundred-
+thousand-line outputs.
+"""
+
+import orjson
+
+def write_feature_collection(path, features):
+    """Write features as a compact FeatureCollection, one feature at
+    a time through orjson rather than pretty-printing the whole
+    collection with the stdlib encoder."""
+    with open(path, "wb") as f:
+        f.write(b'{"type":"FeatureCollection","features":[\n')
+        for i, feat in enumerate(features):
+            if i:
+                f.write(b',\n')
+            f.write(orjson.dumps(feat))
+        f.write(b'\n]}')
+
+def write_feature_lines(path, features):
+    """Write features one per line (newline-delimited GeoJSON) so
+    streaming consumers never have to parse the whole collection."""
+    with open(path, "wb") as f:
+        for feat in features:
+            f.write(orjson.dumps(feat) + b'\n')
@@ -1,35 +1,33 @@
-import geojson
-import json
+import orjson
+
+from geojson_io import write_feature_collection, write_feature_lines
 
 FILE_PATH_1 = "data/oil_tanks_1.geojson"
 FILE_PATH_2 = "data/oil_tanks_2.geojson"
 
-# Load both files
-with open(FILE_PATH_1, "r") as f:
-    data1 = geojson.load(f)
+# Load both files as plain dicts (orjson decode, no geojson wrappers)
+with open(FILE_PATH_1, "rb") as f:
+    data1 = orjson.loads(f.read())
 
-with open(FILE_PATH_2, "r") as f:
-    data2 = geojson.load(f)
+with open(FILE_PATH_2, "rb") as f:
+    data2 = orjson.loads(f.read())
 
 # Combine features
 all_features = data1['features'] + data2['features']
 
-# Remove duplicates based on tank_id
-seen_ids = set()
-unique_features = []
-
+# Dedupe on tank_id in one pass: dict insertion keeps the first
+# occurrence and preserves order
+unique = {}
 for feature in all_features:
-    tank_id = feature['properties'].get('tank_id')
-    if tank_id not in seen_ids:
-        seen_ids.add(tank_id)
-        unique_features.append(feature)
+    unique.setdefault(feature['properties'].get('tank_id'), feature)
+
+unique_features = list(unique.values())
 
-# Create merged collection
-merged = geojson.FeatureCollection(unique_features)
+# Save merged file through the shared compact writer
+write_feature_collection("data/oil_tanks.geojson", unique_features)
 
-# Save merged file
-with open("data/oil_tanks.geojson", "w") as f:
-    geojson.dump(merged, f, indent=2)
+# One-feature-per-line output for streaming consumers
+write_feature_lines("data/oil_tanks.geojsonl", unique_features)
 
 print(f"File 1: {len(data1['features'])} tanks")
 print(f"File 2: {len(data2['features'])} tanks")
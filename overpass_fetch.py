@@ -0,0 +1,380 @@
+"""Shared Overpass fetching for the tank polygon scripts.
+
+Holds the location list, the batched query builder, the pooled HTTP
+session, response caching, and the streaming parse, so optimizations
+land once instead of drifting between tank_polygons.py and
+tank_polygons_by_region.py.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+import gzip
+import hashlib
+import ijson
+import json
+import numpy as np
+from shapely.geometry import Point, Polygon, box
+from shapely.strtree import STRtree
+import geojson
+import os
+import random
+import string
+import time
+from functools import lru_cache
+from operator import itemgetter
+
+# -------------------------------------------------
+# 1. Major oil storage locations worldwide
+# -------------------------------------------------
+LOCATIONS = {
+    "Fujairah, UAE": "25.15,56.30,25.25,56.40",
+    "Rotterdam, Netherlands": "51.85,3.90,51.99,4.50",
+    "Jurong Island, Singapore": "1.22,103.65,1.30,103.75",
+    "Houston Ship Channel, USA": "29.70,-95.30,29.80,-94.90",
+    "Saldanha Bay, South Africa": "-33.05,17.85,-32.95,18.05",
+    "Zhoushan, China": "29.85,121.90,30.10,122.30",
+    "Cushing, OK": "35.95,-97.45,36.15,-96.95"
+}
+
+# Parsed bboxes (south, west, north, east) for mapping ways back
+# to their source location
+BBOXES = {
+    name: tuple(float(v) for v in bbox.split(','))
+    for name, bbox in LOCATIONS.items()
+}
+
+# Packed R-tree over the location bboxes. For 7 regions a linear scan
+# would do, but this keeps lookups O(log n) as LOCATIONS grows
+BBOX_NAMES = list(BBOXES)
+BBOX_TREE = STRtree([
+    box(west, south, east, north)
+    for south, west, north, east in BBOXES.values()
+])
+
+def locate(lon, lat):
+    """Return the location whose bbox contains the point, or None."""
+    hits = BBOX_TREE.query(Point(lon, lat))
+    if len(hits) == 0:
+        return None
+    return BBOX_NAMES[hits[0]]
+
+# Rings with shoelace area at or below this are degenerate
+# (units are squared degrees)
+MIN_RING_AREA = 1e-12
+
+# Opt-in deep validation: set OIL_TANKS_VALIDATE=1 to also run GEOS
+# self-intersection checks. Off by default — the shoelace area test
+# already rejects the degenerate rings OSM actually produces, and
+# constructing a GEOS geometry per tank is the main CPU cost here
+VALIDATE_TOPOLOGY = os.environ.get("OIL_TANKS_VALIDATE") == "1"
+
+def ring_areas(rings):
+    """Absolute shoelace areas for closed coordinate rings, computed
+    in one vectorized pass over all rings at once."""
+    pts = np.asarray([p for ring in rings for p in ring], dtype=np.float64)
+    x, y = pts[:, 0], pts[:, 1]
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+
+    lengths = np.fromiter((len(r) for r in rings), dtype=np.intp, count=len(rings))
+    offsets = np.zeros(len(rings), dtype=np.intp)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+
+    # Zero the cross terms that pair the end of one ring with the
+    # start of the next, so each reduceat sum stays within its ring
+    cross[offsets[1:] - 1] = 0.0
+
+    return 0.5 * np.abs(np.add.reduceat(cross, offsets))
+
+# -------------------------------------------------
+# 2. Single batched query covering every location
+# -------------------------------------------------
+CLAUSE_TEMPLATE = string.Template(
+    '  way["man_made"="storage_tank"]($bbox);\n'
+    '  relation["man_made"="storage_tank"]($bbox);'
+)
+
+QUERY_TEMPLATE = string.Template("""
+[out:json][timeout:300];
+(
+$clauses
+);
+out body;
+>;
+out skel qt;
+""")
+
+@lru_cache(maxsize=8)
+def assemble_query(bboxes):
+    """Fill the precompiled templates for a tuple of bboxes; memoized
+    so retry loops reuse the same query string."""
+    clauses = "\n".join(CLAUSE_TEMPLATE.substitute(bbox=b) for b in bboxes)
+    return QUERY_TEMPLATE.substitute(clauses=clauses)
+
+def build_query(locations):
+    """Union all location bboxes into one query so the server does
+    one index scan and we pay one round-trip instead of seven."""
+    return assemble_query(tuple(locations.values()))
+
+# -------------------------------------------------
+# 3. Alternative Overpass servers
+# -------------------------------------------------
+OVERPASS_SERVERS = [
+    "https://overpass-api.de/api/interpreter",
+    "https://overpass.kumi.systems/api/interpreter",
+    "https://overpass.openstreetmap.ru/api/interpreter"
+]
+
+# Shared session so retries reuse TCP/TLS connections instead of
+# handshaking for every request
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=len(OVERPASS_SERVERS),
+    pool_maxsize=8,
+    max_retries=0  # we do our own retry logic in fetch_tanks
+))
+SESSION.headers.update({
+    "Accept-Encoding": "gzip",
+    "User-Agent": "oil-tanks/1.0"
+})
+
+# -------------------------------------------------
+# 4. Disk cache for raw Overpass responses
+# -------------------------------------------------
+CACHE_DIR = os.path.join(".cache", "overpass")
+CACHE_MAX_AGE = 7 * 24 * 3600  # tank footprints rarely change week to week
+
+def cache_path(query):
+    """Cache file for a query (gzipped raw response bytes)."""
+    key = hashlib.sha1(query.encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json.gz")
+
+def retry_wait(response, attempt):
+    """How long to sleep before retrying: the server's Retry-After
+    hint when it gives one, else exponential backoff with jitter."""
+    header = response.headers.get('Retry-After') if response is not None else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    return min(60, 2 ** attempt + random.uniform(0, 1))
+
+def parse_tanks(path):
+    """Stream-parse a gzipped Overpass response into tank features."""
+
+    # Single pass over the whole response, driving raw parse events:
+    # elements are rebuilt one at a time and split into nodes and
+    # ways as they stream by, and the remark field — which Overpass
+    # appends *after* the elements array when a query hit trouble —
+    # is caught in the same scan instead of a second decompress-and-
+    # tokenize of the file. Ways precede their nodes in Overpass
+    # output, so buffer them (memory is O(ways), far smaller than
+    # the node-heavy response itself)
+    get_node = itemgetter('id', 'lon', 'lat')
+    nodes = {}
+    ways = []
+    builder = None
+    with gzip.open(path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix.startswith('elements.item'):
+                if builder is None:
+                    builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                if event == 'end_map' and prefix == 'elements.item':
+                    el = builder.value
+                    builder = None
+                    if el['type'] == 'node':
+                        node_id, lon, lat = get_node(el)
+                        nodes[node_id] = (lon, lat)
+                    elif el['type'] == 'way' and 'nodes' in el:
+                        ways.append(el)
+            elif prefix == 'remark':
+                print(f"  ⚠️  API remark: {value}")
+
+    # Build way rings; validation happens in one vectorized pass
+    # afterwards
+    candidates = []
+    for el in ways:
+        # Overpass guarantees the referenced nodes are in the
+        # response, so skip the per-node `in` check and only
+        # fall back on a corrupt reply
+        try:
+            coords = [nodes[n] for n in el['nodes']]
+        except KeyError:
+            coords = [nodes[n] for n in el['nodes'] if n in nodes]
+
+        if len(coords) < 3:
+            continue
+
+        # Close polygon if not closed (identity check is
+        # enough: both ends came out of `nodes`, so a closed
+        # ring reuses the same tuple object)
+        if coords[0] is not coords[-1]:
+            coords.append(coords[0])
+
+        # Map the way back to its source location via its
+        # first node
+        location_name = locate(*coords[0])
+        if location_name is None:
+            continue
+
+        candidates.append(
+            (el['id'], location_name, coords, el.get('tags', {}))
+        )
+
+    features = []
+
+    if candidates:
+        areas = ring_areas([c[2] for c in candidates])
+
+        for (way_id, location_name, coords, tags), area in zip(candidates, areas):
+            if area <= MIN_RING_AREA:
+                continue
+
+            # Only when explicitly requested do area-passing rings
+            # also pay for a GEOS validity (self-intersection) test
+            if VALIDATE_TOPOLOGY:
+                try:
+                    if not Polygon(coords).is_valid:
+                        continue
+                except Exception:
+                    continue
+
+            properties = {
+                "tank_id": way_id,
+                "location": location_name
+            }
+
+            # Preserve oil/fuel tags if present
+            if 'content' in tags:
+                properties['content'] = tags['content']
+            if 'substance' in tags:
+                properties['substance'] = tags['substance']
+
+            features.append(geojson.Feature(
+                geometry={"type": "Polygon", "coordinates": [coords]},
+                properties=properties
+            ))
+
+    return features
+
+# -------------------------------------------------
+# 5. Fetch with retry logic and multiple servers
+# -------------------------------------------------
+def fetch_tanks(locations, max_retries=3):
+    """Fetch tanks for all locations in one batched query, with retry
+    logic across multiple servers and a short-lived response cache."""
+
+    query = build_query(locations)
+    cached = cache_path(query)
+
+    # Fresh cached response: skip Overpass entirely. A cache file
+    # that no longer parses (truncated write, disk corruption) gets
+    # evicted here and we fall through to a fresh fetch, instead of
+    # crashing on every rerun until the entry ages out
+    if os.path.exists(cached) and time.time() - os.path.getmtime(cached) < CACHE_MAX_AGE:
+        print(f"\nUsing cached Overpass response: {cached}")
+        try:
+            features = parse_tanks(cached)
+        except Exception as e:
+            print(f"  ✗ Cached response unreadable ({e}), refetching")
+            os.unlink(cached)
+        else:
+            print(f"  ✓ Found {len(features)} valid tanks")
+            return features
+
+    for attempt in range(max_retries):
+        server = OVERPASS_SERVERS[attempt % len(OVERPASS_SERVERS)]
+
+        try:
+            print(f"\n{'Retrying' if attempt > 0 else 'Fetching'} data for {len(locations)} locations...")
+            if attempt > 0:
+                print(f"  Attempt {attempt + 1}/{max_retries} using {server}")
+
+            response = SESSION.post(
+                server,
+                data={"data": query},
+                timeout=200,  # Increased timeout
+                stream=True
+            )
+
+            # Throttled: sleep for however long the server asks, or
+            # back off exponentially when it doesn't say
+            if response.status_code in (429, 503, 504):
+                print(f"  ✗ Server busy (HTTP {response.status_code})")
+                if attempt == max_retries - 1:
+                    print(f"  ✗ All attempts failed")
+                    return []
+                wait = retry_wait(response, attempt)
+                print(f"  Waiting {wait:.1f}s before retry...")
+                time.sleep(wait)
+                continue
+
+            response.raise_for_status()
+
+            # Stream the raw response straight into the cache so
+            # reruns skip Overpass, then parse from the cache file
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = cached + ".tmp"
+            with gzip.open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+            os.replace(tmp_path, cached)
+
+            features = parse_tanks(cached)
+
+            # Overpass reports some failures (slot limits, killed
+            # queries) as a 200 with only a remark and no elements —
+            # don't serve an empty result from cache for a week
+            if not features:
+                os.unlink(cached)
+
+            print(f"  ✓ Found {len(features)} valid tanks")
+
+            return features
+            
+        except requests.exceptions.Timeout:
+            # Retry on the next server immediately — waiting after a
+            # 200 s timeout just wastes more wall clock
+            print(f"  ✗ Timeout on attempt {attempt + 1}")
+            if attempt == max_retries - 1:
+                print(f"  ✗ All attempts failed")
+                return []
+            continue
+
+        except requests.exceptions.RequestException as e:
+            print(f"  ✗ Network error: {e}")
+            if attempt == max_retries - 1:
+                print(f"  ✗ All attempts failed")
+                return []
+            time.sleep(retry_wait(None, attempt))
+            continue
+            
+        except (json.JSONDecodeError, ijson.JSONError):
+            print(f"  ✗ Invalid JSON response")
+            # Don't let a truncated/garbage response poison the cache
+            if os.path.exists(cached):
+                os.unlink(cached)
+            if attempt == max_retries - 1:
+                return []
+            continue
+            
+        except Exception as e:
+            print(f"  ✗ Unexpected error: {e}")
+            if attempt == max_retries - 1:
+                return []
+            continue
+    
+    return []
+
+
+# -------------------------------------------------
+# 6. Per-location grouping for the region scripts
+# -------------------------------------------------
+def fetch_all(locations=LOCATIONS, max_retries=3):
+    """Fetch every location in one batched query and group the
+    resulting features by location."""
+    grouped = {name: [] for name in locations}
+    for feat in fetch_tanks(locations, max_retries):
+        grouped[feat['properties']['location']].append(feat)
+    return grouped
@@ -1,8 +1,11 @@
 import ee
 import sys
-import json
+import orjson
 import os
 import glob
+from concurrent.futures import ThreadPoolExecutor
+
+from gee_tasks import poll_tasks
 
 # Configuration
 CLOUD_PROJECT = 'oil-tankers' 
@@ -10,34 +13,37 @@ USERNAME = "2samenpoli"
 REGIONS_DIR = "data/regions"
 
 def validate_geojson(filepath):
-    """Validate GeoJSON structure and check for common issues."""
+    """Validate GeoJSON structure and return (ok, parsed_data) so the
+    caller can reuse the parse instead of reading the file twice."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
+        with open(filepath, 'rb') as f:
+            data = orjson.loads(f.read())
+
         # Check type
         if data.get('type') != 'FeatureCollection':
             print(f"  ✗ Invalid: type is '{data.get('type')}', expected 'FeatureCollection'")
-            return False
-        
+            return False, None
+
         # Check features
         features = data.get('features', [])
         if not features:
             print(f"  ✗ No features found")
-            return False
-        
+            return False, None
+
         print(f"  ✓ Valid FeatureCollection with {len(features)} features")
-        return True
-        
-    except json.JSONDecodeError as e:
+        return True, data
+
+    except orjson.JSONDecodeError as e:
         print(f"  ✗ Invalid JSON: {e}")
-        return False
+        return False, None
     except Exception as e:
         print(f"  ✗ Validation error: {e}")
-        return False
+        return False, None
 
 def upload_region(filepath):
-    """Upload a single region GeoJSON file to GEE."""
+    """Upload a single region GeoJSON file to GEE.
+
+    Returns the started export task, or None on failure."""
     
     # Get region name from filename
     filename = os.path.basename(filepath)
@@ -48,34 +54,24 @@ def upload_region(filepath):
     print(f"Processing: {filename}")
     print(f"{'='*60}")
     
-    # Validate
+    # Validate (also hands back the parsed data, saving a second read)
     print("Validating GeoJSON...")
-    if not validate_geojson(filepath):
+    valid, geojson_data = validate_geojson(filepath)
+    if not valid:
         print(f"✗ Validation failed for {filename}")
-        return False
-    
-    # Load GeoJSON
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            geojson_data = json.load(f)
-    except Exception as e:
-        print(f"  ✗ Failed to load file: {e}")
-        return False
-    
-    # Convert to Earth Engine FeatureCollection
+        return None
+
+    # Convert to Earth Engine FeatureCollection. Passing the GeoJSON
+    # dict straight in serializes one payload instead of building a
+    # per-feature ComputedObject graph
     print("Converting to Earth Engine format...")
     try:
-        features = []
-        for feat in geojson_data['features']:
-            ee_feature = ee.Feature(feat)
-            features.append(ee_feature)
-        
-        fc = ee.FeatureCollection(features)
-        print(f"  ✓ Created FeatureCollection with {len(features)} features")
-        
+        fc = ee.FeatureCollection(geojson_data)
+        print(f"  ✓ Created FeatureCollection with {len(geojson_data['features'])} features")
+
     except Exception as e:
         print(f"  ✗ Conversion failed: {e}")
-        return False
+        return None
     
     # Upload to Earth Engine
     print(f"Starting export to {asset_id}...")
@@ -87,16 +83,17 @@ def upload_region(filepath):
         )
         
         task.start()
-        
-        print(f"  ✓ Task started: {task.status()['description']}")
-        print(f"  State: {task.status()['state']}")
+
+        # No task.status() here: each status() is a synchronous RPC,
+        # and progress gets polled for all tasks at once afterwards
+        print(f"  ✓ Task started: upload_{region_name}")
         print(f"  Asset ID: {asset_id}")
-        
-        return True
-        
+
+        return task
+
     except Exception as e:
         print(f"  ✗ Export failed: {e}")
-        return False
+        return None
 
 def upload_all_regions():
     """Upload all region files to GEE."""
@@ -122,16 +119,15 @@ def upload_all_regions():
     for f in geojson_files:
         print(f"  - {os.path.basename(f)}")
     
-    # Upload each file
-    successful = 0
-    failed = 0
-    
-    for filepath in geojson_files:
-        if upload_region(filepath):
-            successful += 1
-        else:
-            failed += 1
-    
+    # Upload files in parallel: each upload blocks on its own HTTPS
+    # RPCs and the ee client is thread-safe for task submission
+    # (ee.Initialize has already run above)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tasks = [t for t in executor.map(upload_region, geojson_files) if t is not None]
+
+    successful = len(tasks)
+    failed = len(geojson_files) - successful
+
     # Summary
     print("\n" + "="*60)
     print("UPLOAD SUMMARY")
@@ -143,7 +139,11 @@ def upload_all_regions():
     print("\nAssets location:")
     print(f"  users/{USERNAME}/oil-tankers/[region_name]")
     print("="*60)
-    
+
+    if tasks:
+        print("\nWaiting for export tasks to finish...")
+        poll_tasks(tasks)
+
     return failed == 0
 
 if __name__ == "__main__":
